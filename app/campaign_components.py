@@ -1,4 +1,5 @@
 import streamlit as st
+from datetime import datetime, timezone
 from ui_components import (
     display_notes,
     display_last_edit,
@@ -9,40 +10,24 @@ from ui_components import (
     sanitize_input
 )
 from db_utils import (
-    debug_print,
     get_db_connection,
     save_notes,
     delete_campaign
 )
 from spec_utils import display_spec_versions
-import pandas as pd
-
-# Get database connection
-conn = get_db_connection()
-
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def get_cached_history(campaign_id, get_full_history):
-    """Cache the history data to prevent repeated database calls."""
-    return get_full_history(campaign_id)
 
 def display_campaign_header(row):
     """Display the campaign header with basic information."""
     col1, col2 = st.columns([2, 1])
     with col1:
-        st.markdown(f"### 📋 {row['name']}")
-        st.markdown(f"**Client:** {row['client']}")
-        st.markdown(f"**Status:** {row['status']}")
-        st.markdown(f"**Payment Model:** {row.get('payment_model', 'Not specified')}")
-        # Handle None and NaN values in CPA
-        cpa = row.get('cpa')
-        if pd.isna(cpa) or cpa is None or cpa == '':
-            st.markdown("**Current CPA:** $0.00")
-        else:
-            try:
-                cpa_value = float(cpa)
-                st.markdown(f"**Current CPA:** ${cpa_value:.2f}")
-            except (ValueError, TypeError):
-                st.markdown("**Current CPA:** $0.00")
+        # Emit the whole header as one markdown element; CPA is preformatted at load time
+        st.markdown(
+            f"### 📋 {row['name']}\n\n"
+            f"**Client:** {row['client']}  \n"
+            f"**Status:** {row['status']}  \n"
+            f"**Payment Model:** {row.get('payment_model') or 'Not specified'}  \n"
+            f"**Current CPA:** {row.get('cpa_display') or '$0.00'}"
+        )
     
     with col2:
         if row.get('spec_url'):
@@ -55,16 +40,23 @@ def display_campaign_header(row):
         if row.get('pdf_filename'):
             display_pdf_link(row['pdf_filename'], None)
 
-def display_campaign_actions(row, history_table_exists):
+def toggle_campaign_panel(panel_key, other_key, campaign_id):
+    """Toggle a campaign's history/specs panel, rerunning only when another campaign's panel closes."""
+    current = st.session_state[panel_key]
+    other = st.session_state[other_key]
+    if current == campaign_id:
+        st.session_state[panel_key] = None
+        return
+    st.session_state[panel_key] = campaign_id
+    st.session_state[other_key] = None
+    # The click reruns only this campaign's fragment, which draws the new panel below
+    # its buttons; a panel open in another campaign is outside the fragment, so hiding
+    # it needs this app-wide rerun
+    if current not in (None, campaign_id) or other not in (None, campaign_id):
+        st.rerun()
+
+def display_campaign_actions(row):
     """Display action buttons for the campaign."""
-    # Initialize session state for this campaign if not exists
-    if f'edit_mode_{row["id"]}' not in st.session_state:
-        st.session_state[f'edit_mode_{row["id"]}'] = False
-    if 'show_history_for' not in st.session_state:
-        st.session_state['show_history_for'] = None
-    if 'show_specs_for' not in st.session_state:
-        st.session_state['show_specs_for'] = None
-    
     # Create a container for the action buttons
     with st.container():
         # Primary action buttons in a row
@@ -77,7 +69,7 @@ def display_campaign_actions(row, history_table_exists):
                 use_container_width=True,
                 type="primary"
             ):
-                st.session_state[f'edit_mode_{row["id"]}'] = True
+                st.session_state['edit_mode_ids'].add(row['id'])
         
         with col2:
             if st.button(
@@ -86,12 +78,7 @@ def display_campaign_actions(row, history_table_exists):
                 use_container_width=True,
                 type="secondary"
             ):
-                if st.session_state['show_history_for'] == row['id']:
-                    st.session_state['show_history_for'] = None
-                else:
-                    st.session_state['show_history_for'] = row['id']
-                    st.session_state['show_specs_for'] = None
-                st.rerun()
+                toggle_campaign_panel('show_history_for', 'show_specs_for', row['id'])
         
         with col3:
             if st.button(
@@ -100,12 +87,7 @@ def display_campaign_actions(row, history_table_exists):
                 use_container_width=True,
                 type="secondary"
             ):
-                if st.session_state['show_specs_for'] == row['id']:
-                    st.session_state['show_specs_for'] = None
-                else:
-                    st.session_state['show_specs_for'] = row['id']
-                    st.session_state['show_history_for'] = None
-                st.rerun()
+                toggle_campaign_panel('show_specs_for', 'show_history_for', row['id'])
         
         with col4:
             if st.button(
@@ -116,28 +98,24 @@ def display_campaign_actions(row, history_table_exists):
             ):
                 st.session_state[f'confirm_delete_{row["id"]}'] = True
 
-def display_campaign_content(row, history_table_exists, get_full_history):
+def display_campaign_content(row, get_full_history, latest_edits):
     """Display the main content of the campaign."""
     # Get current notes with safer fallback
     current_notes = row.get('notes', '') or ''
     
     # Display mode (when not editing)
-    if not st.session_state[f'edit_mode_{row["id"]}']:
+    if row['id'] not in st.session_state['edit_mode_ids']:
         # Display the notes
         display_notes(current_notes)
         
         # Show last editor info if available
-        if history_table_exists:
-            try:
-                last_edit = get_cached_history(row['id'], get_full_history)
-                if not last_edit.empty:
-                    display_last_edit(last_edit)
-            except Exception as e:
-                pass  # Silently handle errors since we already show history in display_notes
+        last_edit = latest_edits.get(int(row['id']))
+        if last_edit is not None:
+            display_last_edit(last_edit)
         
         # Show history if this is the selected campaign
-        if st.session_state.get('show_history_for') == row['id'] and history_table_exists:
-            show_campaign_history(row['id'], history_table_exists, get_full_history)
+        if st.session_state.get('show_history_for') == row['id']:
+            show_campaign_history(row['id'], get_full_history)
         
         # Show spec versions if this is the selected campaign
         if st.session_state.get('show_specs_for') == row['id']:
@@ -154,19 +132,31 @@ def display_campaign_content(row, history_table_exists, get_full_history):
             sanitized_editor = sanitize_input(editor_name) or 'Anonymous User'
             
             # Save notes
+            conn = get_db_connection()
             if save_notes(conn, row['id'], sanitized_notes, sanitized_editor):
                 st.success("Notes updated successfully!")
-                # Clear cache and update state
-                st.cache_data.clear()
-                st.session_state[f'edit_mode_{row["id"]}'] = False
-                st.rerun()
+                st.session_state['edit_mode_ids'].discard(row['id'])
+                # save_notes invalidated the cached queries for the next full run; the
+                # fragment rerun reuses this row and latest_edits, so patch them in place
+                row['notes'] = sanitized_notes
+                latest_edits[int(row['id'])] = {
+                    'campaign_id': int(row['id']),
+                    'edited_by': sanitized_editor,
+                    'edited_at': datetime.now(timezone.utc)
+                }
+                st.rerun(scope="fragment")
         
         if cancel_clicked:
-            st.session_state[f'edit_mode_{row["id"]}'] = False
-            st.rerun()
+            st.session_state['edit_mode_ids'].discard(row['id'])
+            st.rerun(scope="fragment")
 
-def display_campaign(row, history_table_exists, get_full_history):
-    """Display a single campaign with all its components."""
+@st.fragment
+def display_campaign(row, get_full_history, latest_edits):
+    """Display a single campaign with all its components.
+    
+    Runs as a fragment so a campaign's own buttons rerun only that campaign;
+    anything that must refresh the whole page calls st.rerun() explicitly.
+    """
     # Add visual separator between campaigns
     st.markdown("---")
     
@@ -174,21 +164,7 @@ def display_campaign(row, history_table_exists, get_full_history):
     display_campaign_header(row)
     
     # Display action buttons
-    display_campaign_actions(row, history_table_exists)
+    display_campaign_actions(row)
     
     # Display main content
-    display_campaign_content(row, history_table_exists, get_full_history)
-
-def display_campaign_search(df):
-    """Display the campaign search interface."""
-    search_query = st.text_input("Search campaigns", "").strip()
-    st.caption("(Search by campaign name, client, status, or any keyword in notes/specs)")
-
-    if search_query:
-        mask = df.apply(lambda row: search_query.lower() in str(row).lower(), axis=1)
-        filtered_df = df[mask]
-        debug_print(f"Search query '{search_query}' returned {len(filtered_df)} results")
-    else:
-        filtered_df = df
-
-    return filtered_df 
\ No newline at end of file
+    display_campaign_content(row, get_full_history, latest_edits)
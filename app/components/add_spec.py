@@ -2,11 +2,11 @@ import streamlit as st
 from db_utils import (
     get_db_connection,
     debug_print,
-    create_spec_versions_table
+    add_campaign,
+    NewCampaign
 )
 from spec_utils import handle_spec_upload
-from datetime import datetime
-from sqlalchemy import text
+import uuid
 import time
 from sqlalchemy.exc import OperationalError
 import pandas as pd
@@ -71,9 +71,8 @@ def show_add_spec_page():
             help="Adding your name helps track who uploaded the spec"
         )
         
-        # Initialize file_uploader_key in session state if not exists
-        if 'file_uploader_key' not in st.session_state:
-            st.session_state.file_uploader_key = str(datetime.now())
+        # Stable per-session uploader key; only rotated after a successful upload
+        st.session_state.setdefault('file_uploader_key', uuid.uuid4().hex)
             
         uploaded_file = st.file_uploader(
             "Choose a PDF file",
@@ -92,31 +91,17 @@ def show_add_spec_page():
         if submitted:
             try:
                 conn = get_db_connection()
-                with conn.session as s:
-                    # Insert the new campaign
-                    result = s.execute(
-                        text("""
-                        INSERT INTO campaign_specs (
-                            name, client, status, payment_model, cpa, 
-                            spec_url, notes, last_updated
-                        ) VALUES (
-                            :name, :client, :status, :payment_model, :cpa,
-                            :spec_url, :notes, CURRENT_TIMESTAMP
-                        ) RETURNING id
-                        """),
-                        {
-                            "name": str(name),
-                            "client": str(client),
-                            "status": str(status),
-                            "payment_model": str(payment_model),
-                            "cpa": float(cpa) if cpa else None,
-                            "spec_url": str(spec_url) if spec_url else None,
-                            "notes": str(notes) if notes else None
-                        }
-                    )
-                    campaign_id = result.scalar()
-                    s.commit()
-                    
+                campaign_id = add_campaign(conn, NewCampaign(
+                    name=name,
+                    client=client,
+                    status=status,
+                    payment_model=payment_model,
+                    cpa=cpa,
+                    spec_url=spec_url,
+                    notes=notes
+                ))
+                
+                if campaign_id is not None:
                     # If a file was uploaded, handle it
                     if uploaded_file:
                         if handle_spec_upload(campaign_id, uploaded_file, uploader_name):
@@ -126,8 +111,7 @@ def show_add_spec_page():
                     else:
                         st.success("Campaign added successfully!")
                     
-                    st.cache_data.clear()
                     st.rerun()
             except Exception as e:
                 st.error(f"Error adding campaign: {str(e)}")
-                debug_print(f"Error details: {str(e)}") 
\ No newline at end of file
+                debug_print(f"Error details: {str(e)}")
@@ -1,29 +1,15 @@
 import streamlit as st
 from db_utils import (
     get_db_connection,
-    get_campaign_data,
-    debug_print,
-    create_spec_versions_table,
-    show_debug_panel
+    get_campaign_list,
+    get_notes,
+    show_debug_panel,
+    update_campaign
 )
 from spec_utils import handle_spec_upload, display_spec_versions
-from datetime import datetime
-from sqlalchemy import text
-import numpy as np
+import uuid
 import pandas as pd
 
-def convert_numpy_types(value):
-    """Convert numpy types to Python native types."""
-    if isinstance(value, np.integer):
-        return int(value)
-    elif isinstance(value, np.floating):
-        return float(value)
-    elif isinstance(value, np.ndarray):
-        return value.tolist()
-    elif pd.isna(value):  # Handle NaN values
-        return 0.0
-    return value
-
 def show_edit_campaigns_page():
     """Display the Edit Campaigns page."""
     st.header("Edit Campaigns")
@@ -32,8 +18,8 @@ def show_edit_campaigns_page():
     if st.session_state.debug_mode:
         show_debug_panel()
     
-    # Get campaign data
-    df = get_campaign_data()
+    # Get campaign data; notes are only loaded for the selected campaign
+    df = get_campaign_list()
     
     if df.empty:
         st.info("No campaigns available to edit.")
@@ -75,7 +61,7 @@ def show_edit_campaigns_page():
                 'payment_model': payment_model,
                 'cpa': cpa_value,
                 'spec_url': campaign_data['spec_url'],
-                'notes': campaign_data['notes']
+                'notes': get_notes(int(campaign_data['id']))
             }
         
         # Create edit form
@@ -139,37 +125,18 @@ def show_edit_campaigns_page():
             submitted = st.form_submit_button("Save Changes")
             
             if submitted:
-                try:
-                    conn = get_db_connection()
-                    with conn.session as s:
-                        # Convert numpy types to Python native types
-                        params = {
-                            "name": new_name,
-                            "client": new_client,
-                            "status": new_status,
-                            "payment_model": new_payment_model,
-                            "cpa": convert_numpy_types(new_cpa),
-                            "spec_url": new_spec_url,
-                            "notes": new_notes,
-                            "id": convert_numpy_types(campaign_data['id'])
-                        }
-                        
-                        s.execute(
-                            text("""
-                            UPDATE campaign_specs 
-                            SET name = :name,
-                                client = :client,
-                                status = :status,
-                                payment_model = :payment_model,
-                                cpa = :cpa,
-                                spec_url = :spec_url,
-                                notes = :notes
-                            WHERE id = :id
-                            """),
-                            params
-                        )
-                        s.commit()
-                    
+                conn = get_db_connection()
+                updated = update_campaign(conn, campaign_data['id'], {
+                    "name": new_name,
+                    "client": new_client,
+                    "status": new_status,
+                    "payment_model": new_payment_model,
+                    "cpa": float(new_cpa),
+                    "spec_url": new_spec_url,
+                    "notes": new_notes
+                })
+                
+                if updated:
                     # Update session state with new values
                     st.session_state[f'edit_form_{campaign_data["id"]}'] = {
                         'name': new_name,
@@ -182,22 +149,10 @@ def show_edit_campaigns_page():
                     }
                     
                     st.success("Campaign updated successfully!")
-                    st.cache_data.clear()
-                except Exception as e:
-                    st.error(f"Error updating campaign: {str(e)}")
-                    debug_print(f"Error details: {str(e)}")
         
         # Spec upload section
         st.write("### Specification Management")
         
-        # Create spec_versions table if it doesn't exist
-        try:
-            conn = get_db_connection()
-            create_spec_versions_table(conn)
-        except Exception as e:
-            debug_print(f"Note: {str(e)}")
-            # Continue execution even if table exists
-        
         # Upload new spec
         st.write("#### Upload New Specification")
         uploader_name = st.text_input(
@@ -205,9 +160,8 @@ def show_edit_campaigns_page():
             help="Adding your name helps track who uploaded the spec"
         )
         
-        # Initialize file_uploader_key in session state if not exists
-        if 'file_uploader_key' not in st.session_state:
-            st.session_state.file_uploader_key = str(datetime.now())
+        # Stable per-session uploader key; only rotated after a successful upload
+        st.session_state.setdefault('file_uploader_key', uuid.uuid4().hex)
             
         uploaded_file = st.file_uploader(
             "Choose a PDF file",
@@ -223,8 +177,7 @@ def show_edit_campaigns_page():
         
         if uploaded_file and st.button("Upload New Spec"):
             if handle_spec_upload(campaign_data['id'], uploaded_file, uploader_name):
-                # Don't clear cache or rerun, just update the UI
-                st.cache_data.clear()
+                # Don't rerun; handle_spec_upload has already invalidated this campaign's caches
                 # Instead of rerunning, just show a success message
                 st.success("✅ Upload successful! The page will refresh automatically in 3 seconds...")
                 # Use JavaScript to refresh the page after a delay
@@ -1,14 +1,12 @@
 import streamlit as st
 from db_utils import (
-    get_db_connection,
-    check_table_exists,
-    create_campaign_specs_table,
-    create_notes_history_table,
     get_campaign_data,
     get_full_history,
+    get_latest_edits_all,
     debug_print
 )
 from campaign_components import display_campaign
+from ui_components import refresh_pdf_index
 
 def show_view_campaigns_page():
     """Display the View Campaigns page."""
@@ -17,64 +15,51 @@ def show_view_campaigns_page():
     # Add a refresh button
     if st.button("🔄 Refresh Data"):
         st.cache_data.clear()
+        refresh_pdf_index()
         st.rerun()
     
-    # Get database connection
-    conn = get_db_connection()
-    debug_print("Database connection established")
+    # Initialize per-page UI state once rather than per campaign row
+    st.session_state.setdefault('edit_mode_ids', set())
+    st.session_state.setdefault('show_history_for', None)
+    st.session_state.setdefault('show_specs_for', None)
     
-    # Check and create tables if needed
-    campaign_table_exists = check_table_exists(conn, 'campaign_specs')
-    if not campaign_table_exists:
-        st.info("Creating campaign_specs table...")
-        create_campaign_specs_table(conn)
-        st.success("Campaign specs table created successfully!")
-    else:
-        debug_print("Using existing campaign_specs table.")
-    
-    # Check if notes_history table exists
-    history_table_exists = check_table_exists(conn, 'notes_history')
-    if not history_table_exists:
-        st.info("Creating notes_history table...")
-        create_notes_history_table(conn)
-        st.success("Notes history table created successfully!")
-    else:
-        debug_print("Using existing notes_history table.")
-    
-    # Get campaign data
-    df = get_campaign_data()
+    # Initialize search state if not exists
+    if 'search_query' not in st.session_state:
+        st.session_state.search_query = ""
     
-    if df.empty:
-        st.info("No data in the table yet. Run populate_data.py to add data.")
-    else:
-        # Initialize search state if not exists
-        if 'search_query' not in st.session_state:
-            st.session_state.search_query = ""
-        
-        # Search input with state management
+    # Search input inside a form so filtering runs on submit, not per keystroke
+    with st.form("search_form"):
         search_query = st.text_input(
             "Search campaigns",
             value=st.session_state.search_query,
             key="search_input"
         )
-        
-        # Update search state
-        if search_query != st.session_state.search_query:
-            st.session_state.search_query = search_query
-        
-        st.caption("(Search by campaign name, client, status, or any keyword in notes/specs)")
-        
-        # Filter campaigns based on search
-        if st.session_state.search_query:
-            mask = df.apply(lambda row: st.session_state.search_query.lower() in str(row).lower(), axis=1)
-            filtered_df = df[mask]
-            debug_print(f"Search query '{st.session_state.search_query}' returned {len(filtered_df)} results")
-        else:
-            filtered_df = df
-        
+        search_submitted = st.form_submit_button("🔍 Search")
+    
+    # Update search state
+    if search_submitted and search_query != st.session_state.search_query:
+        st.session_state.search_query = search_query
+    
+    st.caption("(Search by campaign name, client, status, or any keyword in notes/specs)")
+    
+    # Filter in SQL; a single character matches nearly everything, so it is not sent
+    search = st.session_state.search_query.strip()
+    if len(search) < 2:
+        search = None
+    filtered_df = get_campaign_data(search=search)
+    if search:
+        debug_print(f"Search query '{search}' returned {len(filtered_df)} results")
+    
+    if filtered_df.empty and not search:
+        st.info("No data in the table yet. Run populate_data.py to add data.")
+    else:
         # Display results
         if filtered_df.empty:
             st.info("No campaigns found for your search. Try a different keyword.")
         else:
-            for _, row in filtered_df.iterrows():
-                display_campaign(row, history_table_exists, get_full_history) 
\ No newline at end of file
+            # Fetch the latest edit for every campaign in one query
+            latest_edits = get_latest_edits_all()
+            # Plain dict records avoid building a Series per row; missing values become None
+            records = filtered_df.astype(object).where(filtered_df.notna(), None).to_dict('records')
+            for row in records:
+                display_campaign(row, get_full_history, latest_edits) 
\ No newline at end of file
@@ -2,29 +2,38 @@ import streamlit as st
 from sqlalchemy import text
 import pandas as pd
 from datetime import datetime
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Optional
+import random
 import time
 from sqlalchemy.exc import OperationalError
 
+# Columns matched by the campaign search
+SEARCHABLE_COLS = ('name', 'client', 'status', 'notes', 'spec_url')
+
 def debug_print(message):
     """Helper function to print debug messages only when debug mode is enabled."""
-    if st.session_state.get('debug_mode', False):
-        # Initialize debug messages list if it doesn't exist
-        if 'debug_messages' not in st.session_state:
-            st.session_state.debug_messages = []
-        
-        # Add timestamp to message
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        full_message = f"[{timestamp}] {message}"
-        
-        # Add message to session state
-        st.session_state.debug_messages.append(full_message)
-        
-        # Keep only the last 50 messages to prevent memory issues
-        if len(st.session_state.debug_messages) > 50:
-            st.session_state.debug_messages = st.session_state.debug_messages[-50:]
-        
-        # Display the message
-        st.write(f"Debug - {full_message}")
+    if not st.session_state.get('debug_mode', False):
+        return
+    
+    # Callables let expensive messages (e.g. df.to_string()) skip work when debug is off
+    if callable(message):
+        message = message()
+    
+    # Bounded buffer: the oldest message drops off once 50 are stored
+    if 'debug_messages' not in st.session_state:
+        st.session_state.debug_messages = deque(maxlen=50)
+    
+    # Add timestamp to message
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    full_message = f"[{timestamp}] {message}"
+    
+    # Add message to session state
+    st.session_state.debug_messages.append(full_message)
+    
+    # Display the message
+    st.write(f"Debug - {full_message}")
 
 def show_debug_panel():
     """Display a panel with all debug messages."""
@@ -33,7 +42,7 @@ def show_debug_panel():
             if 'debug_messages' in st.session_state and st.session_state.debug_messages:
                 # Add a button to clear messages
                 if st.button("Clear Debug Messages"):
-                    st.session_state.debug_messages = []
+                    st.session_state.debug_messages.clear()
                     st.rerun()
                 
                 # Show messages in a scrollable container
@@ -43,219 +52,495 @@ def show_debug_panel():
             else:
                 st.info("No debug messages yet")
 
-def get_db_connection(max_retries=3, retry_delay=1):
-    """Get the database connection with retry logic."""
+@st.cache_resource(show_spinner=False)
+def _get_connection():
+    """Create the Streamlit SQL connection once and share it across reruns.
+    
+    Note: conn.query caches results forever unless given a ttl. Reads in this
+    module pass ttl=0 and cache their processed results with st.cache_data,
+    so there is exactly one cache layer and invalidate_after_write works.
+    """
+    # pool_pre_ping validates pooled connections at checkout, replacing an app-level SELECT 1
+    # Extra keyword arguments are forwarded to sqlalchemy.create_engine
+    return st.connection(
+        "postgresql",
+        type="sql",
+        pool_pre_ping=True,
+        pool_recycle=1800,
+        pool_size=5,
+        max_overflow=10,
+    )
+
+# SQLSTATEs worth retrying: connection exceptions and server shutdown/startup
+TRANSIENT_PGCODES = {'08000', '08001', '08003', '08004', '08006', '57P01', '57P02', '57P03'}
+
+def _is_transient(error):
+    """Return True if an OperationalError looks like a transient connection failure."""
+    pgcode = getattr(getattr(error, 'orig', None), 'pgcode', None)
+    # Errors raised before the server answers (reset, refused) carry no SQLSTATE
+    return pgcode is None or pgcode in TRANSIENT_PGCODES
+
+def _backoff_delay(attempt, base=0.5, cap=30):
+    """Exponential backoff with full jitter for the given zero-based attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def get_db_connection():
+    """Get the shared database connection.
+
+    There is no retry loop here: the engine is created lazily, and pool_pre_ping
+    checks each pooled connection on checkout and replaces dead ones. Writes
+    retry transient failures with backoff in _execute_write.
+    """
+    try:
+        return _get_connection()
+    except Exception as e:
+        st.error(f"Error connecting to database: {str(e)}")
+        raise
+
+def _execute_write(conn, statement, params, max_retries=5, before_commit=None):
+    """Execute and commit a write, retrying transient connection errors with backoff.
+
+    Returns the statement's rows, or an empty list if it returns none. If given,
+    before_commit is called with those rows inside the transaction; raising from
+    it rolls the write back.
+
+    Only failures before COMMIT are retried. If the commit itself fails, the
+    server may already have applied the write, so retrying could duplicate it.
+    """
     for attempt in range(max_retries):
-        try:
-            # Get the connection from Streamlit
-            conn = st.connection("postgresql", type="sql")
-            # Test the connection with a simple query
-            conn.query("SELECT 1")
-            return conn
-        except OperationalError as e:
-            if attempt < max_retries - 1:
-                debug_print(f"Connection attempt {attempt + 1} failed, retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-            else:
-                st.error(f"Error connecting to database after {max_retries} attempts: {str(e)}")
+        with conn.session as s:
+            try:
+                result = s.execute(statement, params)
+                rows = result.fetchall() if result.returns_rows else []
+            except OperationalError as e:
+                s.rollback()
+                if attempt == max_retries - 1 or not _is_transient(e):
+                    raise
+            except Exception:
+                s.rollback()
                 raise
-        except Exception as e:
-            st.error(f"Error connecting to database: {str(e)}")
-            raise
+            else:
+                if before_commit is not None:
+                    try:
+                        before_commit(rows)
+                    except Exception:
+                        s.rollback()
+                        raise
+                s.commit()
+                return rows
+        delay = _backoff_delay(attempt)
+        debug_print(f"Write attempt {attempt + 1} failed, retrying in {delay:.2f} seconds...")
+        time.sleep(delay)
 
-def check_table_exists(conn, table_name):
-    """Check if a table exists in the database."""
-    query = """
-    SELECT EXISTS (
-        SELECT FROM information_schema.tables 
-        WHERE table_name = :table_name
-    );
-    """
-    return conn.query(query, params={"table_name": table_name}).iloc[0, 0]
+# Full schema bootstrap; every statement is idempotent so it is safe on existing databases
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS campaign_specs (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    client TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payment_model TEXT,
+    cpa DECIMAL(10,2),
+    pdf_filename TEXT,
+    notes TEXT,
+    spec_url TEXT,
+    last_updated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS payment_model TEXT;
+ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS cpa DECIMAL(10,2);
+ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS pdf_filename TEXT;
+ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS notes TEXT;
+ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS spec_url TEXT;
+ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS last_updated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+CREATE INDEX IF NOT EXISTS idx_cs_name ON campaign_specs (name);
+
+CREATE TABLE IF NOT EXISTS notes_history (
+    id SERIAL PRIMARY KEY,
+    campaign_id INTEGER REFERENCES campaign_specs(id) ON DELETE CASCADE,
+    notes TEXT,
+    edited_by TEXT DEFAULT 'user',
+    edited_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_nh_campaign_edited
+ON notes_history (campaign_id, edited_at DESC);
+
+CREATE TABLE IF NOT EXISTS spec_versions (
+    id SERIAL PRIMARY KEY,
+    campaign_id INTEGER REFERENCES campaign_specs(id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    uploaded_by TEXT DEFAULT 'user',
+    uploaded_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+-- Unique so two concurrent uploads cannot record the same version; falls back to a
+-- plain index if older data already contains duplicates. INCLUDE carries only the
+-- fixed-width columns; filename and uploaded_by are unbounded TEXT and stay out
+-- (B-tree rows cap near 2.7 KB)
+DO $$
+BEGIN
+    IF to_regclass('uq_sv_campaign_version') IS NULL THEN
+        IF EXISTS (
+            SELECT 1 FROM spec_versions GROUP BY campaign_id, version HAVING COUNT(*) > 1
+        ) THEN
+            CREATE INDEX IF NOT EXISTS idx_sv_campaign_version
+            ON spec_versions (campaign_id, version DESC)
+            INCLUDE (id, uploaded_at);
+        ELSE
+            CREATE UNIQUE INDEX uq_sv_campaign_version
+            ON spec_versions (campaign_id, version DESC)
+            INCLUDE (id, uploaded_at);
+            DROP INDEX IF EXISTS idx_sv_campaign_version;
+        END IF;
+    END IF;
+END $$;
 
-def create_campaign_specs_table(conn):
-    """Create the campaign_specs table if it doesn't exist."""
-    with conn.session as s:
+-- Upgrade foreign keys created before ON DELETE CASCADE was added
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'notes_history_campaign_id_fkey' AND confdeltype <> 'c'
+    ) THEN
+        ALTER TABLE notes_history DROP CONSTRAINT notes_history_campaign_id_fkey;
+        ALTER TABLE notes_history ADD CONSTRAINT notes_history_campaign_id_fkey
+            FOREIGN KEY (campaign_id) REFERENCES campaign_specs(id) ON DELETE CASCADE;
+    END IF;
+    IF EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'spec_versions_campaign_id_fkey' AND confdeltype <> 'c'
+    ) THEN
+        ALTER TABLE spec_versions DROP CONSTRAINT spec_versions_campaign_id_fkey;
+        ALTER TABLE spec_versions ADD CONSTRAINT spec_versions_campaign_id_fkey
+            FOREIGN KEY (campaign_id) REFERENCES campaign_specs(id) ON DELETE CASCADE;
+    END IF;
+END $$;
+"""
+
+@st.cache_resource
+def ensure_schema(_conn):
+    """Create or migrate all tables in one transaction, once per process."""
+    with _conn.session as s:
         try:
-            # First check if the table exists
-            table_exists = check_table_exists(conn, 'campaign_specs')
-            
-            if not table_exists:
-                # Create the table if it doesn't exist
-                s.execute(text("""
-                CREATE TABLE campaign_specs (
-                    id SERIAL PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    client TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    payment_model TEXT,
-                    cpa DECIMAL(10,2),
-                    pdf_filename TEXT,
-                    notes TEXT,
-                    spec_url TEXT,
-                    last_updated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                );
-                """))
-                s.commit()
-                debug_print("Created campaign_specs table")
-            else:
-                # Check and add missing columns
-                try:
-                    s.execute(text("ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS payment_model TEXT;"))
-                    s.execute(text("ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS cpa DECIMAL(10,2);"))
-                    s.execute(text("ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS pdf_filename TEXT;"))
-                    s.execute(text("ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS notes TEXT;"))
-                    s.execute(text("ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS spec_url TEXT;"))
-                    s.execute(text("ALTER TABLE campaign_specs ADD COLUMN IF NOT EXISTS last_updated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;"))
-                    s.commit()
-                    debug_print("Updated campaign_specs table with missing columns")
-                except Exception as e:
-                    debug_print(f"Error updating campaign_specs table: {str(e)}")
-                    # Continue even if there's an error updating columns
+            s.execute(text(SCHEMA_SQL))
+            s.commit()
+            debug_print("Database schema is up to date")
         except Exception as e:
-            st.error(f"Error creating/updating campaign_specs table: {str(e)}")
+            s.rollback()
+            st.error(f"Error creating/updating database schema: {str(e)}")
             debug_print(f"Error details: {str(e)}")
             raise
 
-def create_notes_history_table(conn):
-    """Create the notes_history table if it doesn't exist."""
-    with conn.session as s:
-        try:
-            # First check if the table exists
-            table_exists = check_table_exists(conn, 'notes_history')
-            if not table_exists:
-                s.execute(text("""
-                CREATE TABLE notes_history (
-                    id SERIAL PRIMARY KEY,
-                    campaign_id INTEGER REFERENCES campaign_specs(id),
-                    notes TEXT,
-                    edited_by TEXT DEFAULT 'user',
-                    edited_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                );
-                """))
-                s.commit()
-                debug_print("Created notes_history table")
-            else:
-                debug_print("notes_history table already exists")
-        except Exception as e:
-            st.error(f"Error creating notes_history table: {str(e)}")
-            raise
+# Timezone used for every timestamp shown in the UI
+DISPLAY_TZ = 'Europe/London'
 
-def create_spec_versions_table(conn):
-    """Create the spec_versions table if it doesn't exist."""
-    with conn.session as s:
-        try:
-            # First check if the table exists
-            table_exists = check_table_exists(conn, 'spec_versions')
-            if not table_exists:
-                s.execute(text("""
-                CREATE TABLE spec_versions (
-                    id SERIAL PRIMARY KEY,
-                    campaign_id INTEGER REFERENCES campaign_specs(id),
-                    version INTEGER NOT NULL,
-                    filename TEXT NOT NULL,
-                    uploaded_by TEXT DEFAULT 'user',
-                    uploaded_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                );
-                """))
-                s.commit()
-                debug_print("Created spec_versions table")
-            else:
-                debug_print("spec_versions table already exists")
-        except Exception as e:
-            st.error(f"Error creating spec_versions table: {str(e)}")
-            raise
+def _localize(df, cols):
+    """Convert UTC timestamp columns to the display timezone in one vectorized pass."""
+    for col in cols:
+        df[col] = pd.to_datetime(df[col], utc=True).dt.tz_convert(DISPLAY_TZ)
+    return df
+
+def _escape_like(value):
+    """Escape LIKE wildcards so user input is matched literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# The cached _fetch_* functions let exceptions escape so st.cache_data never
+# memoizes a failure; the public get_* wrappers report the error and fall back.
+@st.cache_data(ttl=300)
+def _fetch_campaign_data(status=None, client=None, search=None, limit=None, offset=0):
+    """Cached query behind get_campaign_data."""
+    conn = _get_connection()
+    debug_print("Fetching campaign data from database...")
+    conditions = []
+    params = {}
+    if status:
+        conditions.append("status = :status")
+        params["status"] = status
+    if client:
+        conditions.append("client = :client")
+        params["client"] = client
+    if search:
+        # Matched case-insensitively as a literal substring across the searchable columns
+        conditions.append(
+            f"concat_ws(chr(31), {', '.join(SEARCHABLE_COLS)}) ILIKE :search"
+        )
+        params["search"] = f"%{_escape_like(search)}%"
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    page_clause = ""
+    if limit is not None:
+        page_clause = "LIMIT :limit OFFSET :offset"
+        params["limit"] = int(limit)
+        params["offset"] = int(offset)
+
+    # Use a simple string query instead of text() for caching
+    query = f"""
+        SELECT 
+            id, name, client, status, payment_model, cpa,
+            pdf_filename, notes, spec_url, 
+            last_updated 
+        FROM campaign_specs 
+        {where_clause}
+        ORDER BY name, id
+        {page_clause};
+    """
+    debug_print("Executing query...")
+    df = _localize(conn.query(query, params=params, ttl=0), ['last_updated'])
+    # Normalise numeric dtypes once so callers never see mixed/object values
+    df['id'] = df['id'].astype('int64')
+    df['cpa'] = pd.to_numeric(df['cpa'], errors='coerce')
+    df['cpa_display'] = df['cpa'].fillna(0.0).map('${:.2f}'.format)
+    debug_print(f"Query returned {len(df)} rows")
+    debug_print("First few rows of data:")
+    debug_print(lambda: df.head().to_string())
+    return df
 
-@st.cache_data(ttl=5)
-def get_campaign_data():
-    """Get all campaign data."""
-    conn = get_db_connection()
+def get_campaign_data(status=None, client=None, search=None, limit=None, offset=0):
+    """Get campaign data, filtered and paged in SQL when arguments are given."""
     try:
-        debug_print("Fetching campaign data from database...")
-        # Use a simple string query instead of text() for caching
-        query = """
-            SELECT 
-                id, name, client, status, payment_model, cpa,
-                pdf_filename, notes, spec_url, 
-                last_updated AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/London' as last_updated 
-            FROM campaign_specs 
-            ORDER BY name;
-        """
-        debug_print("Executing query...")
-        df = conn.query(query)
-        debug_print(f"Query returned {len(df)} rows")
-        debug_print("First few rows of data:")
-        debug_print(df.head().to_string())
-        return df
+        return _fetch_campaign_data(status, client, search, limit, offset)
     except Exception as e:
         debug_print(f"Error in get_campaign_data: {str(e)}")
         st.error(f"Error in get_campaign_data: {str(e)}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=5)
-def get_history_data(campaign_id):
-    """Get the most recent edit for a campaign."""
-    conn = get_db_connection()
+@st.cache_data(ttl=300)
+def _fetch_campaign_list():
+    """Cached query behind get_campaign_list."""
+    conn = _get_connection()
+    df = conn.query(
+        """
+        SELECT 
+            id, name, client, status, payment_model, cpa,
+            pdf_filename, spec_url, 
+            last_updated 
+        FROM campaign_specs 
+        ORDER BY name, id;
+        """,
+        ttl=0
+    )
+    _localize(df, ['last_updated'])
+    df['id'] = df['id'].astype('int64')
+    df['cpa'] = pd.to_numeric(df['cpa'], errors='coerce')
+    debug_print(f"Campaign list query returned {len(df)} rows")
+    return df
+
+def get_campaign_list():
+    """Get campaign data without the (potentially large) notes column."""
     try:
-        df = conn.query(
-            """
-            SELECT notes, edited_by, edited_at AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/London' as edited_at 
-            FROM notes_history 
-            WHERE campaign_id = :campaign_id 
-            ORDER BY edited_at DESC 
-            LIMIT 1
-            """,
-            params={"campaign_id": campaign_id}
-        )
-        debug_print(f"History query result for campaign {campaign_id}:")
-        debug_print(df.to_string())
-        return df
+        return _fetch_campaign_list()
     except Exception as e:
-        st.error(f"Error in get_history_data: {str(e)}")
+        st.error(f"Error in get_campaign_list: {str(e)}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=5)
+@st.cache_data(ttl=300)
+def _fetch_notes(campaign_id):
+    """Cached query behind get_notes."""
+    conn = _get_connection()
+    df = conn.query(
+        "SELECT notes FROM campaign_specs WHERE id = :campaign_id",
+        params={"campaign_id": int(campaign_id)},
+        ttl=0
+    )
+    if df.empty or pd.isna(df.iloc[0, 0]):
+        return ''
+    return df.iloc[0, 0]
+
+def get_notes(campaign_id):
+    """Get the current notes for a single campaign."""
+    try:
+        return _fetch_notes(int(campaign_id))
+    except Exception as e:
+        st.error(f"Error in get_notes: {str(e)}")
+        return ''
+
+@st.cache_data(ttl=300)
+def _fetch_campaign_bundle(campaign_id):
+    """Cached query behind get_campaign_bundle."""
+    conn = _get_connection()
+    df = conn.query(
+        """
+        SELECT 
+            'hist' AS kind, NULL::integer AS id, notes, edited_by AS author,
+            edited_at AS ts,
+            NULL::integer AS version, NULL::text AS filename
+        FROM notes_history 
+        WHERE campaign_id = :campaign_id
+        UNION ALL
+        SELECT 
+            'ver', id, NULL, uploaded_by,
+            uploaded_at,
+            version, filename
+        FROM spec_versions 
+        WHERE campaign_id = :campaign_id
+        ORDER BY ts DESC
+        """,
+        params={"campaign_id": campaign_id},
+        ttl=0
+    )
+    _localize(df, ['ts'])
+    history = (
+        df[df['kind'] == 'hist']
+        .rename(columns={'author': 'edited_by', 'ts': 'edited_at'})
+        [['notes', 'edited_by', 'edited_at']]
+        .reset_index(drop=True)
+    )
+    versions = (
+        df[df['kind'] == 'ver']
+        .rename(columns={'author': 'uploaded_by', 'ts': 'uploaded_at'})
+        [['id', 'version', 'filename', 'uploaded_by', 'uploaded_at']]
+        .astype({'id': 'int64', 'version': 'int64'})
+        .sort_values('version', ascending=False)
+        .reset_index(drop=True)
+    )
+    # Format timestamps for display in one vectorized pass
+    history['edited_display'] = history['edited_at'].dt.strftime('%B %d, %Y at %I:%M %p (%Z)').fillna('')
+    versions['uploaded_display'] = versions['uploaded_at'].dt.strftime('%B %d, %Y at %I:%M %p (%Z)').fillna('')
+    debug_print(f"Bundle for campaign {campaign_id}: {len(history)} history entries, {len(versions)} spec versions")
+    # Both lists are small and only iterated, so hand back plain dicts rather than frames
+    return {'history': history.to_dict('records'), 'versions': versions.to_dict('records')}
+
+def get_campaign_bundle(campaign_id):
+    """Get a campaign's edit history and spec versions in a single query."""
+    try:
+        return _fetch_campaign_bundle(int(campaign_id))
+    except Exception as e:
+        st.error(f"Error in get_campaign_bundle: {str(e)}")
+        return {'history': [], 'versions': []}
+
 def get_full_history(campaign_id):
     """Get full edit history for a campaign."""
-    conn = get_db_connection()
+    return get_campaign_bundle(int(campaign_id))['history']
+
+@st.cache_data(ttl=300)
+def _fetch_latest_edits_all():
+    """Cached query behind get_latest_edits_all."""
+    conn = _get_connection()
+    df = conn.query(
+        """
+        SELECT DISTINCT ON (campaign_id)
+            campaign_id,
+            edited_by,
+            edited_at
+        FROM notes_history
+        ORDER BY campaign_id, edited_at DESC
+        """,
+        ttl=0
+    )
+    _localize(df, ['edited_at'])
+    debug_print(f"Latest edits query returned {len(df)} campaigns")
+    return {int(edit['campaign_id']): edit for edit in df.to_dict('records')}
+
+def get_latest_edits_all():
+    """Get the most recent edit for every campaign, keyed by campaign id."""
     try:
-        df = conn.query(
-            """
-            SELECT 
-                notes, 
-                edited_by, 
-                edited_at AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/London' as edited_at 
-            FROM notes_history 
-            WHERE campaign_id = :campaign_id 
-            ORDER BY edited_at DESC
-            """,
-            params={"campaign_id": campaign_id}
-        )
-        debug_print(f"Full history query result for campaign {campaign_id}:")
-        debug_print(f"Found {len(df)} history entries")
-        debug_print(df.to_string())
-        return df
+        return _fetch_latest_edits_all()
     except Exception as e:
-        st.error(f"Error in get_full_history: {str(e)}")
-        return pd.DataFrame()
+        st.error(f"Error in get_latest_edits_all: {str(e)}")
+        return {}
+
+def invalidate_after_write(campaign_id=None):
+    """Clear only the cached queries affected by a write to a campaign.
+    
+    Writers own invalidation and call this after a successful commit; readers
+    just read, so the long TTLs above are only a safety net.
+    """
+    _fetch_campaign_data.clear()
+    _fetch_campaign_list.clear()
+    _fetch_latest_edits_all.clear()
+    if campaign_id is not None:
+        _fetch_notes.clear(int(campaign_id))
+        _fetch_campaign_bundle.clear(int(campaign_id))
+
+@dataclass
+class NewCampaign:
+    """Field values for a campaign insert, normalized once on construction."""
+    name: str
+    client: str
+    status: str
+    payment_model: Optional[str] = None
+    cpa: Optional[float] = None
+    pdf_filename: Optional[str] = None
+    notes: Optional[str] = None
+    spec_url: Optional[str] = None
+
+    def __post_init__(self):
+        # Blank optional text is stored as NULL; a CPA of 0 is kept as 0
+        for field in ('payment_model', 'pdf_filename', 'notes', 'spec_url'):
+            if not getattr(self, field):
+                setattr(self, field, None)
+        if self.cpa is not None:
+            self.cpa = float(self.cpa)
+
+# Write statements, parsed once at import rather than on every call
+SQL_SAVE_NOTES = text("""
+WITH upd AS (
+    UPDATE campaign_specs
+    SET notes = :notes, last_updated = CURRENT_TIMESTAMP
+    WHERE id = :id
+    RETURNING id
+)
+INSERT INTO notes_history (campaign_id, notes, edited_by, edited_at)
+SELECT id, :notes, :editor, CURRENT_TIMESTAMP FROM upd
+""")
+SQL_INSERT_SPEC_VERSION = text("""
+INSERT INTO spec_versions (campaign_id, version, filename, uploaded_by, uploaded_at)
+VALUES (:campaign_id, :version, :filename, :uploader, CURRENT_TIMESTAMP)
+""")
+SQL_UPDATE_PDF = text("UPDATE campaign_specs SET pdf_filename = :filename WHERE id = :id")
+SQL_DELETE_CAMPAIGN = text("DELETE FROM campaign_specs WHERE id = :id RETURNING id")
+SQL_INSERT_CAMPAIGN = text("""
+INSERT INTO campaign_specs (
+    name, client, status, payment_model, cpa,
+    pdf_filename, notes, spec_url, last_updated
+) VALUES (
+    :name, :client, :status, :payment_model, :cpa,
+    :pdf_filename, :notes, :spec_url, CURRENT_TIMESTAMP
+) RETURNING id
+""")
+SQL_UPDATE_CAMPAIGN = text("""
+UPDATE campaign_specs
+SET name = :name,
+    client = :client,
+    status = :status,
+    payment_model = :payment_model,
+    cpa = :cpa,
+    spec_url = :spec_url,
+    notes = :notes
+WHERE id = :id
+""")
+# Picks the next version, records it and points the campaign at the new file in one
+# statement. Returns no row when the campaign does not exist.
+SQL_RECORD_SPEC_UPLOAD = text("""
+WITH next AS (
+    SELECT c.id, c.name || ' - Posting Instructions v' || (COALESCE(MAX(sv.version), 0) + 1)
+               || '_' || :timestamp || '.pdf' AS filename,
+           COALESCE(MAX(sv.version), 0) + 1 AS version
+    FROM campaign_specs c
+    LEFT JOIN spec_versions sv ON sv.campaign_id = c.id
+    WHERE c.id = :campaign_id
+    GROUP BY c.id, c.name
+),
+ins AS (
+    INSERT INTO spec_versions (campaign_id, version, filename, uploaded_by, uploaded_at)
+    SELECT id, version, filename, :uploader, CURRENT_TIMESTAMP FROM next
+    RETURNING version, filename
+),
+upd AS (
+    UPDATE campaign_specs SET pdf_filename = ins.filename
+    FROM ins WHERE campaign_specs.id = :campaign_id
+)
+SELECT version, filename FROM ins
+""")
 
 def save_notes(conn, campaign_id, notes, editor_name):
     """Save notes and update history."""
     try:
-        with conn.session as s:
-            # Update campaign notes
-            s.execute(
-                text("UPDATE campaign_specs SET notes = :notes, last_updated = CURRENT_TIMESTAMP WHERE id = :id"),
-                {"notes": notes, "id": campaign_id}
-            )
-            
-            # Record in history with explicit timezone
-            s.execute(
-                text("INSERT INTO notes_history (campaign_id, notes, edited_by, edited_at) VALUES (:campaign_id, :notes, :editor, CURRENT_TIMESTAMP)"),
-                {"campaign_id": campaign_id, "notes": notes, "editor": editor_name}
-            )
-            
-            s.commit()
+        # Update campaign notes and record history in a single round-trip
+        _execute_write(
+            conn,
+            SQL_SAVE_NOTES,
+            {"id": campaign_id, "notes": notes, "editor": editor_name}
+        )
+        invalidate_after_write(campaign_id)
         return True
     except Exception as e:
         st.error(f"Error saving notes: {str(e)}")
@@ -263,20 +548,7 @@ def save_notes(conn, campaign_id, notes, editor_name):
 
 def get_spec_versions(campaign_id):
     """Get all versions of a campaign's spec."""
-    conn = get_db_connection()
-    try:
-        # Convert campaign_id to regular Python int
-        campaign_id = int(campaign_id)
-        df = conn.query(
-            "SELECT id, version, filename, uploaded_by, uploaded_at AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/London' as uploaded_at FROM spec_versions WHERE campaign_id = :campaign_id ORDER BY version DESC",
-            params={"campaign_id": campaign_id}
-        )
-        debug_print(f"Spec versions query result for campaign {campaign_id}:")
-        debug_print(df.to_string())
-        return df
-    except Exception as e:
-        st.error(f"Error in get_spec_versions: {str(e)}")
-        return pd.DataFrame()
+    return get_campaign_bundle(int(campaign_id))['versions']
 
 def save_spec_version(conn, campaign_id, version, filename, uploader_name):
     """Save a new spec version."""
@@ -285,162 +557,120 @@ def save_spec_version(conn, campaign_id, version, filename, uploader_name):
         campaign_id = int(campaign_id)
         version = int(version)
         
-        # Use a single transaction for all operations
-        with conn.session as s:
-            try:
-                # Insert the new version
-                s.execute(
-                    text("""
-                    INSERT INTO spec_versions (campaign_id, version, filename, uploaded_by, uploaded_at)
-                    VALUES (:campaign_id, :version, :filename, :uploader, CURRENT_TIMESTAMP)
-                    """),
-                    {
-                        "campaign_id": int(campaign_id),  # Ensure Python int
-                        "version": int(version),          # Ensure Python int
-                        "filename": str(filename),         # Ensure string
-                        "uploader": str(uploader_name)    # Ensure string
-                    }
-                )
-                s.commit()
-                return True
-            except OperationalError as e:
-                s.rollback()
-                st.error(f"Database connection error: {str(e)}")
-                debug_print(f"Error details: {str(e)}")
-                return False
-            except Exception as e:
-                s.rollback()
-                st.error(f"Error saving spec version: {str(e)}")
-                debug_print(f"Error details: {str(e)}")
-                return False
+        # Insert the new version, retrying transient connection failures
+        _execute_write(
+            conn,
+            SQL_INSERT_SPEC_VERSION,
+            {
+                "campaign_id": campaign_id,
+                "version": version,
+                "filename": str(filename),
+                "uploader": str(uploader_name)
+            }
+        )
+        invalidate_after_write(campaign_id)
+        return True
+    except OperationalError as e:
+        st.error(f"Database connection error: {str(e)}")
+        debug_print(f"Error details: {str(e)}")
+        return False
     except Exception as e:
-        st.error(f"Error in save_spec_version: {str(e)}")
+        st.error(f"Error saving spec version: {str(e)}")
         debug_print(f"Error details: {str(e)}")
         return False
 
 def update_campaign_pdf(conn, campaign_id, filename):
     """Update the campaign's current PDF filename."""
     try:
-        with conn.session as s:
-            try:
-                s.execute(
-                    text("UPDATE campaign_specs SET pdf_filename = :filename WHERE id = :id"),
-                    {"filename": filename, "id": campaign_id}
-                )
-                s.commit()
-                return True
-            except Exception as e:
-                s.rollback()
-                st.error(f"Error updating campaign PDF: {str(e)}")
-                debug_print(f"Error details: {str(e)}")
-                return False
+        # The UPDATE is idempotent, so transient failures are safe to retry
+        _execute_write(
+            conn,
+            SQL_UPDATE_PDF,
+            {"filename": filename, "id": campaign_id}
+        )
+        invalidate_after_write(campaign_id)
+        return True
     except Exception as e:
-        st.error(f"Error in update_campaign_pdf: {str(e)}")
+        st.error(f"Error updating campaign PDF: {str(e)}")
         debug_print(f"Error details: {str(e)}")
         return False
 
 def delete_campaign(conn, campaign_id):
-    """Delete a campaign and its associated data."""
+    """Delete a campaign; its history and spec versions cascade with it."""
     try:
-        with conn.session as s:
-            try:
-                debug_print(f"Starting deletion of campaign {campaign_id}")
-                
-                # First delete associated records in other tables
-                s.execute(
-                    text("DELETE FROM notes_history WHERE campaign_id = :id"),
-                    {"id": campaign_id}
-                )
-                debug_print("Deleted associated notes history")
-                
-                s.execute(
-                    text("DELETE FROM spec_versions WHERE campaign_id = :id"),
-                    {"id": campaign_id}
-                )
-                debug_print("Deleted associated spec versions")
-                
-                # Then delete the campaign itself
-                s.execute(
-                    text("DELETE FROM campaign_specs WHERE id = :id"),
-                    {"id": campaign_id}
-                )
-                debug_print("Deleted campaign from campaign_specs")
-                
-                s.commit()
-                debug_print("Deletion transaction committed successfully")
-                
-                # Verify deletion
-                verify_result = s.execute(
-                    text("SELECT id FROM campaign_specs WHERE id = :id"),
-                    {"id": campaign_id}
-                ).fetchone()
-                
-                if verify_result is None:
-                    debug_print("Campaign deletion verified")
-                    return True
-                else:
-                    debug_print("Campaign still exists after deletion attempt")
-                    return False
-                    
-            except Exception as e:
-                s.rollback()
-                debug_print(f"Error during campaign deletion: {str(e)}")
-                st.error(f"Error deleting campaign: {str(e)}")
-                return False
+        debug_print(f"Starting deletion of campaign {campaign_id}")
+        
+        # notes_history and spec_versions rows are removed by ON DELETE CASCADE
+        deleted = _execute_write(conn, SQL_DELETE_CAMPAIGN, {"id": campaign_id})
+        
+        if deleted:
+            debug_print("Campaign deletion committed successfully")
+            invalidate_after_write(campaign_id)
+            return True
+        else:
+            debug_print("No campaign found to delete")
+            return False
     except Exception as e:
         debug_print(f"Error in delete_campaign: {str(e)}")
-        st.error(f"Error in delete_campaign: {str(e)}")
+        st.error(f"Error deleting campaign: {str(e)}")
         return False
 
-def add_campaign(conn, name, client, status, payment_model=None, cpa=None, pdf_filename=None, notes=None, spec_url=None):
-    """Add a new campaign to the database."""
+def add_campaign(conn, campaign):
+    """Add a new campaign to the database and return its ID, or None on failure."""
     try:
-        debug_print(f"Starting to add campaign: {name} for client: {client}")
-        debug_print(f"Parameters: status={status}, payment_model={payment_model}, cpa={cpa}, pdf_filename={pdf_filename}, spec_url={spec_url}")
+        debug_print(lambda: f"Starting to add campaign: {campaign}")
         
-        with conn.session as s:
-            try:
-                # Insert the new campaign
-                debug_print("Executing INSERT query...")
-                result = s.execute(
-                    text("""
-                    INSERT INTO campaign_specs (
-                        name, client, status, payment_model, cpa, 
-                        pdf_filename, notes, spec_url, last_updated
-                    ) VALUES (
-                        :name, :client, :status, :payment_model, :cpa,
-                        :pdf_filename, :notes, :spec_url, CURRENT_TIMESTAMP
-                    ) RETURNING id
-                    """),
-                    {
-                        "name": str(name),
-                        "client": str(client),
-                        "status": str(status),
-                        "payment_model": str(payment_model) if payment_model else None,
-                        "cpa": float(cpa) if cpa else None,
-                        "pdf_filename": str(pdf_filename) if pdf_filename else None,
-                        "notes": str(notes) if notes else None,
-                        "spec_url": str(spec_url) if spec_url else None
-                    }
-                )
-                campaign_id = result.scalar()
-                debug_print(f"Campaign inserted successfully with ID: {campaign_id}")
-                
-                s.commit()
-                debug_print("Transaction committed successfully")
-                
-                # Verify the campaign was added
-                verify_query = text("SELECT id, name, client FROM campaign_specs WHERE id = :id")
-                verify_result = s.execute(verify_query, {"id": campaign_id}).fetchone()
-                debug_print(f"Verification query result: {verify_result}")
-                
-                return True
-            except Exception as e:
-                s.rollback()
-                debug_print(f"Error during campaign insertion: {str(e)}")
-                st.error(f"Error adding campaign: {str(e)}")
-                return False
+        # Insert the new campaign
+        debug_print("Executing INSERT query...")
+        rows = _execute_write(conn, SQL_INSERT_CAMPAIGN, asdict(campaign))
+        campaign_id = rows[0].id
+        
+        # RETURNING already confirms the row; no need for a verification SELECT
+        debug_print(lambda: f"Inserted campaign id={campaign_id} name={campaign.name} client={campaign.client}")
+        invalidate_after_write(campaign_id)
+        
+        return campaign_id
     except Exception as e:
         debug_print(f"Error in add_campaign: {str(e)}")
-        st.error(f"Error in add_campaign: {str(e)}")
-        return False 
\ No newline at end of file
+        st.error(f"Error adding campaign: {str(e)}")
+        return None
+
+def update_campaign(conn, campaign_id, fields):
+    """Update a campaign's editable fields; returns True on success.
+    
+    fields holds name, client, status, payment_model, cpa, spec_url and notes.
+    """
+    try:
+        campaign_id = int(campaign_id)
+        _execute_write(conn, SQL_UPDATE_CAMPAIGN, {**fields, "id": campaign_id})
+        invalidate_after_write(campaign_id)
+        return True
+    except Exception as e:
+        st.error(f"Error updating campaign: {str(e)}")
+        debug_print(f"Error details: {str(e)}")
+        return False
+
+def record_spec_upload(conn, campaign_id, uploader_name, timestamp, before_commit=None):
+    """Allocate, record and link the next spec version for a campaign.
+    
+    Returns the (version, filename) row, or None if the campaign does not exist.
+    If given, before_commit is called with that row before the transaction
+    commits; raising from it rolls the new version back. Errors propagate so
+    the upload page can report them in its progress display.
+    """
+    campaign_id = int(campaign_id)
+    
+    def check_row(rows):
+        if rows and before_commit is not None:
+            before_commit(rows[0])
+    
+    rows = _execute_write(
+        conn,
+        SQL_RECORD_SPEC_UPLOAD,
+        {"campaign_id": campaign_id, "timestamp": timestamp, "uploader": str(uploader_name)},
+        before_commit=check_row
+    )
+    if not rows:
+        return None
+    invalidate_after_write(campaign_id)
+    return rows[0]
\ No newline at end of file
@@ -1,5 +1,6 @@
 import streamlit as st
 from theme import init_theme, get_theme_styles
+from ui_components import refresh_pdf_index
 
 def setup_navigation():
     """Set up the main navigation and settings."""
@@ -46,6 +47,7 @@ def setup_navigation():
                 st.session_state.debug_mode = st.checkbox("Enable Debug Mode", value=True)
                 if st.button("🗑️ Clear Cache", use_container_width=True):
                     st.cache_data.clear()
+                    refresh_pdf_index()
                     # Reset navigation state
                     st.session_state.page = "📋 View Campaigns"
                     st.rerun()
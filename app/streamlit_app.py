@@ -1,9 +1,7 @@
 import streamlit as st
 from db_utils import (
     get_db_connection,
-    create_campaign_specs_table,
-    create_notes_history_table,
-    create_spec_versions_table
+    ensure_schema
 )
 
 # Set page config - MUST be first Streamlit command
@@ -21,9 +19,7 @@ from components.edit_campaigns import show_edit_campaigns_page
 # Initialize database tables
 try:
     conn = get_db_connection()
-    create_campaign_specs_table(conn)
-    create_notes_history_table(conn)
-    create_spec_versions_table(conn)
+    ensure_schema(conn)
 except Exception as e:
     st.error("Error initializing database tables. Please check your database connection.")
     st.stop()
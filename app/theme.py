@@ -1,14 +1,13 @@
 import streamlit as st
+from ui_components import refresh_pdf_index
 
 def init_theme():
     """Initialize theme settings."""
     if 'theme' not in st.session_state:
         st.session_state.theme = "dark"  # Default to dark theme
 
-def get_theme_styles():
-    """Return CSS styles based on current theme."""
-    is_dark = st.session_state.theme == "dark"
-    
+def _build_theme_styles(is_dark):
+    """Build the CSS styles for the dark or light theme."""
     return f"""
         <style>
             .stApp {{
@@ -79,6 +78,16 @@ def get_theme_styles():
         </style>
     """
 
+# Only two themes exist, so build both stylesheets once at import
+_THEME_STYLES = {
+    "dark": _build_theme_styles(is_dark=True),
+    "light": _build_theme_styles(is_dark=False),
+}
+
+def get_theme_styles():
+    """Return CSS styles based on current theme."""
+    return _THEME_STYLES["dark" if st.session_state.theme == "dark" else "light"]
+
 def create_theme_controls():
     """Create theme toggle and debug controls in the sidebar."""
     col1, col2 = st.sidebar.columns(2)
@@ -99,4 +108,5 @@ def create_theme_controls():
             st.session_state.debug_mode = st.checkbox("Enable Debug Mode", value=st.session_state.debug_mode)
             if st.button("Clear Cache"):
                 st.cache_data.clear()
+                refresh_pdf_index()
                 st.rerun() 
\ No newline at end of file
@@ -1,18 +1,19 @@
 import streamlit as st
 import re
 import os
-from datetime import datetime
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
 from pathlib import Path
-import pytz  # Add this import for timezone handling
-from db_utils import get_db_connection  # Add this import
+import pandas as pd
+from db_utils import debug_print
 
-# Debug mode flag
-DEBUG_MODE = False
+# Sanitizer tables and patterns, built once at import
+_MD_ESCAPE_TRANS = str.maketrans({'*': r'\*', '_': r'\_', '~': r'\~'})
+_JS_PROTO_RE = re.compile(r'javascript:', re.IGNORECASE)
+_FN_BAD_RE = re.compile(r'[<>:"/\\|?*]')
 
-def debug_print(message):
-    """Helper function to print debug messages only when debug mode is enabled."""
-    if st.session_state.get('debug_mode', False):
-        st.write(f"Debug - {message}")
+# Display timezone, resolved once
+_UK_TZ = ZoneInfo('Europe/London')
 
 def sanitize_markdown(text):
     """Sanitize markdown content."""
@@ -20,16 +21,38 @@ def sanitize_markdown(text):
         return ""
     # Only escape markdown special characters that could cause formatting issues
     # Don't escape backticks as they're often used for code
-    text = re.sub(r'([*_~])', r'\\\1', text)
+    text = text.translate(_MD_ESCAPE_TRANS)
     return text.strip()
 
+def _strip_tags(text):
+    """Remove <...> spans in a single left-to-right pass."""
+    parts = []
+    pos = 0
+    start = text.find('<')
+    while start != -1:
+        end = text.find('>', start + 1)
+        if end == -1:
+            break
+        if end == start + 1:
+            # '<>' is not a tag; look for the next opening bracket
+            start = text.find('<', end)
+            continue
+        parts.append(text[pos:start])
+        pos = end + 1
+        start = text.find('<', pos)
+    parts.append(text[pos:])
+    return ''.join(parts)
+
 def sanitize_input(text):
     """Sanitize user input."""
     if not text:
         return ""
-    # Only remove HTML tags and script-like content
-    text = re.sub(r'<[^>]+>', '', text)  # Remove HTML tags
-    text = re.sub(r'javascript:', '', text, flags=re.IGNORECASE)  # Remove script protocols
+    # Only remove HTML tags and script-like content; most input has neither,
+    # so a single character scan skips each pass entirely
+    if '<' in text:
+        text = _strip_tags(text)  # Remove HTML tags
+    if ':' in text:
+        text = _JS_PROTO_RE.sub('', text)  # Remove script protocols
     return text.strip()
 
 def format_timestamp(timestamp):
@@ -43,11 +66,10 @@ def format_timestamp(timestamp):
     
     # If timestamp is naive (no timezone info), assume it's UTC
     if timestamp.tzinfo is None:
-        timestamp = pytz.UTC.localize(timestamp)
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
     
     # Convert to UK timezone
-    uk_tz = pytz.timezone('Europe/London')
-    uk_time = timestamp.astimezone(uk_tz)
+    uk_time = timestamp.astimezone(_UK_TZ)
     
     # Format the time with timezone information
     formatted_time = uk_time.strftime("%B %d, %Y at %I:%M %p")
@@ -56,48 +78,30 @@ def format_timestamp(timestamp):
     return f"{formatted_time} ({timezone_name})"
 
 def display_notes(current_notes):
-    """Display notes with proper markdown handling and editor information."""
+    """Display notes with proper markdown handling.
+    
+    Last-edit details are shown separately by display_last_edit, from the
+    per-campaign lookup the caller fetches once for the whole page.
+    """
     if current_notes:
         # Display the notes content in a code block
         st.markdown(f"```\n{sanitize_markdown(current_notes)}\n```")
-        
-        # Get the last edit information
-        conn = get_db_connection()
-        try:
-            last_edit = conn.query(
-                """
-                SELECT edited_by, edited_at AT TIME ZONE 'UTC' AT TIME ZONE 'Europe/London' as edited_at 
-                FROM notes_history 
-                WHERE notes = :notes 
-                ORDER BY edited_at DESC 
-                LIMIT 1
-                """,
-                params={"notes": current_notes}
-            )
-            
-            if not last_edit.empty:
-                editor_name = last_edit['edited_by'].iloc[0] or 'Anonymous User'
-                edit_time = last_edit['edited_at'].iloc[0]
-                formatted_time = format_timestamp(edit_time)
-                st.caption(f"📝 Last edited by {editor_name} on {formatted_time}")
-        except Exception as e:
-            st.error(f"Error retrieving edit history: {str(e)}")
     else:
         st.info("No notes available for this campaign.")
 
 def display_last_edit(last_edit):
-    """Display the last edit information."""
-    if not last_edit.empty and not last_edit['edited_at'].isna().any():
-        edit_time = last_edit['edited_at'].iloc[0]
+    """Display the last edit information from a single history record."""
+    if last_edit is not None and not pd.isna(last_edit.get('edited_at')):
+        edit_time = last_edit['edited_at']
         formatted_time = format_timestamp(edit_time)
-        editor_name = last_edit['edited_by'].iloc[0] or 'Anonymous User'
+        editor_name = last_edit.get('edited_by') or 'Anonymous User'
         st.caption(f"📝 Last edited by {editor_name} on {formatted_time}")
     else:
         st.caption("📝 No edit history available")
 
-def display_history(history_df):
+def display_history(history):
     """Display the edit history in a clean, organized format with pagination."""
-    if not history_df.empty:
+    if history:
         st.write("### Edit History")
         
         # Initialize pagination state if not exists
@@ -106,7 +110,7 @@ def display_history(history_df):
         
         # Pagination settings
         items_per_page = 5
-        total_pages = (len(history_df) + items_per_page - 1) // items_per_page
+        total_pages = (len(history) + items_per_page - 1) // items_per_page
         
         # Display pagination controls at the top
         if total_pages > 1:
@@ -114,22 +118,21 @@ def display_history(history_df):
             with col1:
                 if st.button("⬅️ Previous", disabled=st.session_state.history_page == 0):
                     st.session_state.history_page -= 1
-                    st.rerun()
+                    st.rerun(scope="fragment")
             with col2:
                 st.markdown(f"**Page {st.session_state.history_page + 1} of {total_pages}**")
             with col3:
                 if st.button("Next ➡️", disabled=st.session_state.history_page == total_pages - 1):
                     st.session_state.history_page += 1
-                    st.rerun()
+                    st.rerun(scope="fragment")
             st.markdown("---")  # Add separator after pagination
         
-        # Calculate start and end indices for current page
+        # Slice out the current page once
         start_idx = st.session_state.history_page * items_per_page
-        end_idx = min(start_idx + items_per_page, len(history_df))
+        page = history[start_idx:start_idx + items_per_page]
         
         # Display current page of history entries
-        for idx in range(start_idx, end_idx):
-            history_row = history_df.iloc[idx]
+        for idx, history_row in enumerate(page):
             with st.container():
                 # Create columns for metadata and content
                 col1, col2 = st.columns([1, 3])
@@ -138,7 +141,7 @@ def display_history(history_df):
                     st.markdown("**Editor:**")
                     st.markdown(f"*{history_row['edited_by'] or 'Anonymous User'}*")
                     st.markdown("**Date:**")
-                    st.markdown(f"*{format_timestamp(history_row['edited_at'])}*")
+                    st.markdown(f"*{history_row['edited_display'] or format_timestamp(history_row['edited_at'])}*")
                 
                 with col2:
                     st.markdown("**Changes:**")
@@ -148,7 +151,7 @@ def display_history(history_df):
                         st.info("No changes recorded")
                 
                 # Add a subtle separator between entries
-                if idx < end_idx - 1:  # Don't add separator after the last entry
+                if idx < len(page) - 1:  # Don't add separator after the last entry
                     st.markdown("---")
     else:
         st.info("No edit history available for this campaign.")
@@ -156,6 +159,7 @@ def display_history(history_df):
 def create_notes_form(row, current_notes):
     """Create a form for editing notes."""
     form_key = f"notes_form_{row['id']}"
+    action_key = f'form_action_{form_key}'
     with st.form(key=form_key):
         editor_name = st.text_input(
             "Your Name",
@@ -186,26 +190,19 @@ def create_notes_form(row, current_notes):
         
         # Store the form state
         if save_clicked or cancel_clicked:
-            st.session_state[f'form_submitted_{form_key}'] = True
-            st.session_state[f'form_action_{form_key}'] = 'save' if save_clicked else 'cancel'
+            st.session_state[action_key] = 'save' if save_clicked else 'cancel'
     
-    # Check if form was submitted in a previous run
-    if st.session_state.get(f'form_submitted_{form_key}', False):
-        action = st.session_state.get(f'form_action_{form_key}')
-        # Clear the form state
-        st.session_state[f'form_submitted_{form_key}'] = False
-        st.session_state[f'form_action_{form_key}'] = None
-        return editor_name, new_notes, action == 'save', action == 'cancel'
-    
-    return editor_name, new_notes, False, False
+    # Consume a pending submission; pop clears it in the same step
+    action = st.session_state.pop(action_key, None)
+    return editor_name, new_notes, action == 'save', action == 'cancel'
 
-def show_campaign_history(campaign_id, history_table_exists, get_full_history):
+def show_campaign_history(campaign_id, get_full_history):
     """Display campaign history with proper error handling."""
-    if st.session_state.get('show_history_for') == campaign_id and history_table_exists:
+    if st.session_state.get('show_history_for') == campaign_id:
         try:
-            history_df = get_full_history(campaign_id)
-            debug_print(f"History query result: {history_df}")
-            display_history(history_df)
+            history = get_full_history(campaign_id)
+            debug_print(f"History query returned {len(history)} entries")
+            display_history(history)
         except Exception as e:
             st.error(f"Error loading history: {str(e)}")
 
@@ -227,11 +224,26 @@ def sanitize_filename(filename):
         return None
     
     # Only remove truly dangerous characters, preserve spaces and other valid characters
-    safe_name = re.sub(r'[<>:"/\\|?*]', '', safe_name)  # Only remove Windows-invalid characters
+    safe_name = _FN_BAD_RE.sub('', safe_name)  # Only remove Windows-invalid characters
     debug_print(f"After sanitization: {safe_name}")
     
     return safe_name
 
+@st.cache_resource(show_spinner=False)
+def _pdf_index():
+    """Map PDF filenames to their paths under app/static, scanned once."""
+    index = {}
+    # Campaign spec directories take precedence over loose files in app/static
+    for path in sorted(Path("app/static/specs").glob("*/*.pdf")):
+        index.setdefault(path.name, str(path))
+    for path in sorted(Path("app/static").glob("*.pdf")):
+        index.setdefault(path.name, str(path))
+    return index
+
+def refresh_pdf_index():
+    """Forget the cached PDF listing, e.g. after a new spec is written."""
+    _pdf_index.clear()
+
 def find_pdf_file(filename):
     """Find a PDF file in the expected locations."""
     if not filename:
@@ -240,37 +252,16 @@ def find_pdf_file(filename):
         
     debug_print(f"Looking for file: {filename}")
     
-    # Try the exact path first
-    if os.path.exists(filename):
-        debug_print(f"File found at exact path: {filename}")
-        return filename
-    
-    # Try in app/static/specs/{campaign_id} directories
-    specs_path = Path("app/static/specs")
-    debug_print(f"Checking specs directory: {specs_path}")
-    debug_print(f"Specs directory exists: {specs_path.exists()}")
-    
-    if specs_path.exists():
-        for campaign_dir in specs_path.iterdir():
-            if campaign_dir.is_dir():
-                debug_print(f"Checking campaign directory: {campaign_dir}")
-                potential_path = campaign_dir / filename
-                debug_print(f"Checking path: {potential_path}")
-                if os.path.exists(potential_path):
-                    debug_print(f"File found in specs directory: {potential_path}")
-                    return str(potential_path)
-    
-    # Try in app/static directory
-    static_path = Path("app/static")
-    debug_print(f"Checking static directory: {static_path}")
-    debug_print(f"Static directory exists: {static_path.exists()}")
+    # Stored values are normally bare names; only probe the disk for explicit paths
+    if '/' in filename or os.sep in filename:
+        if os.path.exists(filename):
+            debug_print(f"File found at exact path: {filename}")
+            return filename
     
-    if static_path.exists():
-        full_path = static_path / filename
-        debug_print(f"Checking path: {full_path}")
-        if full_path.exists():
-            debug_print(f"File found in static directory: {full_path}")
-            return str(full_path)
+    path = _pdf_index().get(filename)
+    if path:
+        debug_print(f"File found: {path}")
+        return path
     
     debug_print(f"File not found in any location: {filename}")
     return None
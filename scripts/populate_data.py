@@ -1,10 +1,13 @@
 import os
+import functools
 import psycopg2
+from psycopg2.extras import execute_values
 import toml
 from datetime import datetime
 
 
-# Load secrets from .streamlit/secrets.toml
+# Load secrets from .streamlit/secrets.toml (parsed once per run)
+@functools.lru_cache(maxsize=1)
 def load_secrets():
     with open('.streamlit/secrets.toml', 'r') as f:
         return toml.load(f)
@@ -21,23 +24,28 @@ def get_db_connection():
         sslmode=secrets["postgres"]["sslmode"]
     )
 
-# Function to insert data into database
-def insert_campaign_data(name, client, status, pdf_filename, notes, spec_url):
+# Function to insert all campaigns in one round-trip
+def insert_campaigns(campaigns):
     conn = get_db_connection()
     cur = conn.cursor()
 
     try:
-        cur.execute("""
+        now = datetime.now()
+        execute_values(cur, """
             INSERT INTO campaign_specs 
             (name, client, status, pdf_filename, notes, spec_url, last_updated)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (name, client, status, pdf_filename, notes, spec_url, datetime.now()))
+            VALUES %s
+        """, [
+            (c["name"], c["client"], c["status"], c["pdf_filename"], c["notes"], c["spec_url"], now)
+            for c in campaigns
+        ])
         
         conn.commit()
-        print(f"Successfully inserted data for {name}")
+        print(f"Successfully inserted data for {len(campaigns)} campaigns")
         return True
     except Exception as e:
-        print(f"Error inserting data for {name}: {str(e)}")
+        conn.rollback()
+        print(f"Error inserting campaign data: {str(e)}")
         return False
     finally:
         cur.close()
@@ -85,14 +93,7 @@ def main():
         else:
             print(f"PDF exists for {campaign['name']}, proceeding with database insertion.")
 
-        insert_campaign_data(
-            campaign["name"],
-            campaign["client"],
-            campaign["status"],
-            campaign["pdf_filename"],
-            campaign["notes"],
-            campaign["spec_url"]
-        )
+    insert_campaigns(campaigns)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file